@@ -1,15 +1,24 @@
 import tkinter as tk
 from tkinter import messagebox, colorchooser, font as tkFont, OptionMenu, Scale
-from threading import Thread, Event
+from threading import Thread, Event, Lock
 import time
 import re
 import logging
 import math # Standard math for expression evaluation
 import cmath # For complex number functions if explicitly named
 import json
+import ast
+import operator
 import os
-from collections import deque
+import sys
+from collections import deque, OrderedDict
+from array import array
 import datetime
+import urllib.request
+import multiprocessing
+import sqlite3
+import hashlib
+import importlib.metadata
 
 # Optional libraries
 try:
@@ -40,8 +49,779 @@ try:
 except ImportError:
     statistics = None
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
 # Sympy will be imported dynamically when needed for equation solving.
 
+_MATRIX_NUM = r"[+-]?(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?"
+_MATRIX_NUM_RE = re.compile(_MATRIX_NUM)
+_MATRIX_BLOCK_LINE_RE = re.compile(rf"[ \t]*{_MATRIX_NUM}(?:[ \t,;]+{_MATRIX_NUM})*[ \t,;]*")
+
+class Matrix:
+    # Row-major float matrix (2-D) or vector (1-D) on a compact array('d'); the fallback when NumPy is not installed.
+    __slots__ = ('shape', 'data')
+
+    def __init__(self, shape, data):
+        self.shape, self.data = tuple(shape), data
+
+    @classmethod
+    def from_rows(cls, rows):
+        return cls((len(rows), len(rows[0])), array('d', (v for row in rows for v in row)))
+
+    @classmethod
+    def identity(cls, n):
+        return cls((n, n), array('d', (1.0 if i == j else 0.0 for i in range(n) for j in range(n))))
+
+    def tolist(self):
+        if len(self.shape) == 1: return list(self.data)
+        c = self.shape[1]
+        return [list(self.data[i * c:(i + 1) * c]) for i in range(self.shape[0])]
+
+    def _square_rows(self, op):
+        if len(self.shape) != 2 or self.shape[0] != self.shape[1]: raise ValueError(f"{op} requires a square matrix")
+        return self.tolist()
+
+    @property
+    def T(self):
+        if len(self.shape) == 1: return self
+        r, c = self.shape; d = self.data
+        return Matrix((c, r), array('d', (d[i * c + j] for j in range(c) for i in range(r))))
+
+    def _elementwise(self, other, fn):
+        if isinstance(other, Matrix):
+            if other.shape != self.shape: raise ValueError(f"Shape mismatch {self.shape} vs {other.shape}")
+            return Matrix(self.shape, array('d', map(fn, self.data, other.data)))
+        return Matrix(self.shape, array('d', (fn(v, other) for v in self.data)))
+
+    def __add__(self, other): return self._elementwise(other, lambda a, b: a + b)
+    __radd__ = __add__
+    def __sub__(self, other): return self._elementwise(other, lambda a, b: a - b)
+    def __rsub__(self, other): return self._elementwise(other, lambda a, b: b - a)
+    def __mul__(self, other): return self._elementwise(other, lambda a, b: a * b)
+    __rmul__ = __mul__
+    def __truediv__(self, other): return self._elementwise(other, lambda a, b: a / b)
+    def __neg__(self): return Matrix(self.shape, array('d', (-v for v in self.data)))
+
+    def __matmul__(self, other):
+        a_rows = self.tolist() if len(self.shape) == 2 else [list(self.data)]
+        b_rows = other.tolist() if len(other.shape) == 2 else [[v] for v in other.data]
+        if len(a_rows[0]) != len(b_rows): raise ValueError(f"Shape mismatch {self.shape} @ {other.shape}")
+        b_cols = list(zip(*b_rows))
+        out = [[math.fsum(x * y for x, y in zip(row, col)) for col in b_cols] for row in a_rows]
+        if len(self.shape) == 1 and len(other.shape) == 1: return out[0][0]
+        if len(self.shape) == 1: return Matrix((len(out[0]),), array('d', out[0]))
+        if len(other.shape) == 1: return Matrix((len(out),), array('d', (row[0] for row in out)))
+        return Matrix.from_rows(out)
+
+    def __pow__(self, n):
+        self._square_rows("Matrix power")
+        base, result = (self.inv() if n < 0 else self), Matrix.identity(self.shape[0])
+        n = abs(n)
+        while n:
+            if n & 1: result = result @ base
+            base, n = base @ base, n >> 1
+        return result
+
+    def _lu(self, op):
+        # In-place Doolittle LU with partial pivoting; sign is 0.0 for a singular matrix.
+        a = self._square_rows(op); n = len(a); perm = list(range(n)); sign = 1.0
+        for k in range(n):
+            p = max(range(k, n), key=lambda i: abs(a[i][k]))
+            if a[p][k] == 0.0: return a, perm, 0.0
+            if p != k: a[k], a[p] = a[p], a[k]; perm[k], perm[p] = perm[p], perm[k]; sign = -sign
+            for i in range(k + 1, n):
+                f = a[i][k] / a[k][k]; a[i][k] = f
+                if f:
+                    row_i, row_k = a[i], a[k]
+                    for j in range(k + 1, n): row_i[j] -= f * row_k[j]
+        return a, perm, sign
+
+    def det(self):
+        lu, _, sign = self._lu("det")
+        return sign * math.prod(lu[i][i] for i in range(len(lu))) if sign else 0.0
+
+    def trace(self):
+        rows = self._square_rows("trace")
+        return math.fsum(rows[i][i] for i in range(len(rows)))
+
+    def solve(self, b):
+        lu, perm, sign = self._lu("solve")
+        if not sign: raise ZeroDivisionError("Matrix is singular")
+        n = len(lu)
+        b_cols = [list(b.data)] if len(b.shape) == 1 else [list(col) for col in zip(*b.tolist())]
+        if len(b_cols[0]) != n: raise ValueError(f"Shape mismatch {self.shape} vs {b.shape}")
+        x_cols = []
+        for col in b_cols:
+            y = [col[perm[i]] for i in range(n)]
+            for i in range(n): y[i] -= math.fsum(lu[i][j] * y[j] for j in range(i))
+            for i in range(n - 1, -1, -1): y[i] = (y[i] - math.fsum(lu[i][j] * y[j] for j in range(i + 1, n))) / lu[i][i]
+            x_cols.append(y)
+        return Matrix((n,), array('d', x_cols[0])) if len(b.shape) == 1 else Matrix.from_rows([list(r) for r in zip(*x_cols)])
+
+    def inv(self):
+        self._square_rows("inv")
+        return self.solve(Matrix.identity(self.shape[0]))
+
+    def norm(self, ord=None):
+        if ord is None: return math.sqrt(math.fsum(v * v for v in self.data))
+        if len(self.shape) == 1:
+            if ord == math.inf: return max(abs(v) for v in self.data)
+            return math.fsum(abs(v) ** ord for v in self.data) ** (1.0 / ord)
+        rows = self.tolist()
+        if ord == 1: return max(math.fsum(abs(v) for v in col) for col in zip(*rows))
+        if ord == math.inf: return max(math.fsum(abs(v) for v in row) for row in rows)
+        if ord == 2: return math.sqrt(max(abs(v) for v in (self.T @ self).eigvals()))
+        raise ValueError(f"Unsupported matrix norm order {ord}")
+
+    @staticmethod
+    def _hessenberg(a):
+        # In-place Householder similarity reduction to upper Hessenberg form (same eigenvalues, zeros below the subdiagonal).
+        n = len(a)
+        for k in range(n - 2):
+            x = [a[i][k] for i in range(k + 1, n)]
+            alpha = -math.copysign(math.sqrt(math.fsum(v * v for v in x)), x[0])
+            v = x[:]; v[0] -= alpha
+            vnorm2 = math.fsum(t * t for t in v)
+            if vnorm2 == 0.0: continue
+            for j in range(n):
+                s = 2.0 * math.fsum(v[t] * a[k + 1 + t][j] for t in range(len(v))) / vnorm2
+                for t in range(len(v)): a[k + 1 + t][j] -= s * v[t]
+            for i in range(n):
+                s = 2.0 * math.fsum(a[i][k + 1 + t] * v[t] for t in range(len(v))) / vnorm2
+                for t in range(len(v)): a[i][k + 1 + t] -= s * v[t]
+            for i in range(k + 2, n): a[i][k] = 0.0
+        return a
+
+    def eigvals(self, max_iter=60):
+        # Hessenberg reduction followed by Francis double-shift QR (the EISPACK hqr scheme, as used by LAPACK behind
+        # numpy.linalg.eigvals), deflating 1x1 and 2x2 (complex pair) blocks from the bottom. Exceptional shifts every
+        # 10 iterations break the cycles plain shifted QR falls into on orthogonal matrices such as permutations.
+        a = self._hessenberg(self._square_rows("eig")); n = len(a); eigs = [None] * n
+        anorm = math.fsum(abs(a[i][j]) for i in range(n) for j in range(max(i - 1, 0), n))
+        nn, t = n - 1, 0.0
+        while nn >= 0:
+            its = 0
+            while True:
+                l = nn
+                while l >= 1:
+                    s = abs(a[l - 1][l - 1]) + abs(a[l][l]) or anorm
+                    if abs(a[l][l - 1]) + s == s: a[l][l - 1] = 0.0; break
+                    l -= 1
+                x = a[nn][nn]
+                if l == nn: eigs[nn] = x + t; nn -= 1; break
+                y, w = a[nn - 1][nn - 1], a[nn][nn - 1] * a[nn - 1][nn]
+                if l == nn - 1:
+                    p = 0.5 * (y - x); q = p * p + w; z = math.sqrt(abs(q)); x += t
+                    if q >= 0.0:
+                        z = p + math.copysign(z, p)
+                        eigs[nn - 1] = eigs[nn] = x + z
+                        if z: eigs[nn] = x - w / z
+                    else: eigs[nn - 1], eigs[nn] = complex(x + p, z), complex(x + p, -z)
+                    nn -= 2; break
+                if its == max_iter: raise ArithmeticError("eig did not converge")
+                if its and its % 10 == 0: # Exceptional shift
+                    t += x
+                    for i in range(nn + 1): a[i][i] -= x
+                    s = abs(a[nn][nn - 1]) + abs(a[nn - 1][nn - 2])
+                    x = y = 0.75 * s; w = -0.4375 * s * s
+                its += 1
+                m = nn - 2
+                while True: # Look for two consecutive small subdiagonal elements
+                    z = a[m][m]; r, s = x - z, y - z
+                    p = (r * s - w) / a[m + 1][m] + a[m][m + 1]; q = a[m + 1][m + 1] - z - r - s; r = a[m + 2][m + 1]
+                    s = abs(p) + abs(q) + abs(r); p, q, r = p / s, q / s, r / s
+                    if m == l: break
+                    u = abs(a[m][m - 1]) * (abs(q) + abs(r))
+                    v = abs(p) * (abs(a[m - 1][m - 1]) + abs(z) + abs(a[m + 1][m + 1]))
+                    if u + v == v: break
+                    m -= 1
+                for i in range(m + 2, nn + 1):
+                    a[i][i - 2] = 0.0
+                    if i != m + 2: a[i][i - 3] = 0.0
+                for k in range(m, nn): # Double-shift QR step on rows l..nn and columns m..nn
+                    if k != m:
+                        p, q, r = a[k][k - 1], a[k + 1][k - 1], a[k + 2][k - 1] if k != nn - 1 else 0.0
+                        x = abs(p) + abs(q) + abs(r)
+                        if x: p, q, r = p / x, q / x, r / x
+                    s = math.copysign(math.sqrt(p * p + q * q + r * r), p)
+                    if not s: continue
+                    if k == m:
+                        if l != m: a[k][k - 1] = -a[k][k - 1]
+                    else: a[k][k - 1] = -s * x
+                    p += s; x, y, z = p / s, q / s, r / s; q, r = q / p, r / p
+                    for j in range(k, nn + 1):
+                        p = a[k][j] + q * a[k + 1][j]
+                        if k != nn - 1: p += r * a[k + 2][j]; a[k + 2][j] -= p * z
+                        a[k + 1][j] -= p * y; a[k][j] -= p * x
+                    for i in range(l, min(nn, k + 3) + 1):
+                        p = x * a[i][k] + y * a[i][k + 1]
+                        if k != nn - 1: p += z * a[i][k + 2]; a[i][k + 2] -= p * r
+                        a[i][k + 1] -= p * q; a[i][k] -= p
+        return eigs
+
+class MatrixEvaluator:
+    # Small recursive-descent evaluator for matrix/vector expressions. Literals are written as [[1,2],[3,4]], [1 2; 3 4],
+    # or as tab/newline separated blocks; numbers are parsed straight into array('d') buffers, which NumPy wraps without copying.
+    FUNCTIONS = {'det': 1, 'inv': 1, 'transpose': 1, 'trace': 1, 'solve': 2, 'eig': 1, 'norm': (1, 2)}
+    CONSTANTS = {'pi': math.pi, 'e': math.e, 'inf': math.inf}
+
+    def __init__(self, use_numpy=True):
+        self.np = numpy if use_numpy else None
+
+    @classmethod
+    def looks_like_matrix(cls, text):
+        if '[' in text or cls.is_block(text): return True
+        return bool(re.match(r"\s*(?:%s)\s*\(" % "|".join(cls.FUNCTIONS), text, re.IGNORECASE)) and bool(re.search(r"[\t\n]", text.strip()))
+
+    @staticmethod
+    def is_block(text):
+        lines = [line for line in text.strip().splitlines() if line.strip()]
+        return ('\n' in text.strip() or '\t' in text) and all(_MATRIX_BLOCK_LINE_RE.fullmatch(line) for line in lines)
+
+    def _wrap(self, data, shape):
+        if self.np is not None: return self.np.frombuffer(data, dtype=self.np.float64).reshape(shape)
+        return Matrix(shape, data)
+
+    def _parse_block(self, text):
+        data, rows, cols = array('d'), 0, None
+        for line in text.splitlines():
+            count = 0
+            for m in _MATRIX_NUM_RE.finditer(line): data.append(float(m.group())); count += 1
+            if not count: continue
+            if cols is not None and count != cols: raise ValueError("Rows have different lengths")
+            cols = count; rows += 1
+        return self._wrap(data, (cols,) if rows == 1 else (rows, cols))
+
+    def evaluate(self, text):
+        self.text, self.pos, self.tabular = text, 0, False
+        if self.is_block(text): self.tabular = True; return self._parse_block(text)
+        value = self._expr()
+        if self._peek(): raise SyntaxError(f"Unexpected '{self._peek()}' at position {self.pos}")
+        return value
+
+    def _peek(self):
+        while self.pos < len(self.text) and self.text[self.pos].isspace(): self.pos += 1
+        return self.text[self.pos] if self.pos < len(self.text) else ''
+
+    def _expect(self, ch):
+        if self._peek() != ch: raise SyntaxError(f"Expected '{ch}' at position {self.pos}")
+        self.pos += 1
+
+    @staticmethod
+    def _is_scalar(value): return isinstance(value, (int, float, complex))
+
+    def _expr(self):
+        value = self._term()
+        while self._peek() in ('+', '-'):
+            op = self.text[self.pos]; self.pos += 1
+            rhs = self._term()
+            # NumPy would broadcast mismatched shapes; require equal shapes so both backends agree.
+            if not self._is_scalar(value) and not self._is_scalar(rhs) and tuple(value.shape) != tuple(rhs.shape):
+                raise ValueError(f"Shape mismatch {tuple(value.shape)} vs {tuple(rhs.shape)}")
+            value = value + rhs if op == '+' else value - rhs
+        return value
+
+    def _term(self):
+        value = self._power()
+        while self._peek() in ('*', '/', '@') and not self.text.startswith('**', self.pos):
+            op = self.text[self.pos]; self.pos += 1
+            rhs = self._power()
+            if op == '/':
+                if not self._is_scalar(rhs): raise ValueError("Can only divide by a scalar")
+                value = value / rhs
+            elif self._is_scalar(value) or self._is_scalar(rhs): value = value * rhs
+            else: value = value @ rhs
+        return value
+
+    def _power(self):
+        base = self._unary()
+        if self._peek() == '^' or self.text.startswith('**', self.pos):
+            self.pos += 1 if self.text[self.pos] == '^' else 2
+            if self._peek() in ('t', 'T') and not self.text[self.pos + 1:self.pos + 2].isalnum():
+                self.pos += 1; return base.T
+            exponent = self._unary()
+            if self._is_scalar(base): return base ** exponent
+            if not self._is_scalar(exponent) or exponent != int(exponent): raise ValueError("Matrix powers must be integers")
+            return self.np.linalg.matrix_power(base, int(exponent)) if self.np is not None else base ** int(exponent)
+        return base
+
+    def _unary(self):
+        if self._peek() == '-': self.pos += 1; return -self._unary()
+        if self._peek() == '+': self.pos += 1; return self._unary()
+        return self._atom()
+
+    def _atom(self):
+        ch = self._peek()
+        if ch == '[': return self._bracket()
+        if ch == '(':
+            self.pos += 1; value = self._expr(); self._expect(')'); return value
+        m = _MATRIX_NUM_RE.match(self.text, self.pos)
+        if m and ch not in '+-': self.pos = m.end(); return float(m.group())
+        m = re.compile(r"[a-zA-Z_]\w*").match(self.text, self.pos)
+        if not m: raise SyntaxError(f"Unexpected '{ch}' at position {self.pos}")
+        name = m.group().lower(); self.pos = m.end()
+        if name in self.CONSTANTS: return self.CONSTANTS[name]
+        if name not in self.FUNCTIONS: raise NameError(f"Unknown matrix function '{name}'")
+        self._expect('(')
+        args = [self._arg()]
+        while self._peek() == ',': self.pos += 1; args.append(self._arg())
+        self._expect(')')
+        arity = self.FUNCTIONS[name]
+        if len(args) not in (arity if isinstance(arity, tuple) else (arity,)): raise TypeError(f"{name} takes {arity} argument(s)")
+        return self.call(name, args)
+
+    def _arg(self):
+        # An argument spanning tabs/newlines up to the next top-level ',' or ')' is a pasted block.
+        depth, end = 0, self.pos
+        while end < len(self.text):
+            ch = self.text[end]
+            if ch in '([': depth += 1
+            elif ch in ')]':
+                if depth == 0: break
+                depth -= 1
+            elif ch == ',' and depth == 0: break
+            end += 1
+        chunk = self.text[self.pos:end]
+        if ('\n' in chunk.strip() or '\t' in chunk) and self.is_block(chunk):
+            self.pos = end; self.tabular = True; return self._parse_block(chunk)
+        return self._expr()
+
+    def _bracket(self):
+        return self._wrap(*self._bracket_raw())
+
+    def _bracket_raw(self):
+        self.pos += 1
+        data, row_lengths, count, nested = array('d'), [], 0, False
+        while True:
+            while self.pos < len(self.text) and self.text[self.pos] in ' \t,': self.pos += 1
+            ch = self.text[self.pos] if self.pos < len(self.text) else ''
+            if not ch: raise SyntaxError("Unclosed '['")
+            if ch == ']': self.pos += 1; break
+            if ch in ';\r\n': self.pos += 1; row_lengths.append(count); count = 0; continue
+            if ch == '[':
+                if count or (row_lengths and not nested): raise SyntaxError("Cannot mix numbers and nested rows")
+                nested = True
+                row_data, row_shape = self._bracket_raw()
+                if len(row_shape) != 1: raise ValueError("Only 1-D and 2-D matrices are supported")
+                data.extend(row_data); row_lengths.append(row_shape[0]); continue
+            m = _MATRIX_NUM_RE.match(self.text, self.pos)
+            if not m or nested: raise SyntaxError(f"Unexpected '{ch}' in matrix at position {self.pos}")
+            data.append(float(m.group())); count += 1; self.pos = m.end()
+        if count: row_lengths.append(count)
+        row_lengths = [n for n in row_lengths if n]
+        if not row_lengths: raise ValueError("Empty matrix")
+        if len(set(row_lengths)) != 1: raise ValueError("Rows have different lengths")
+        return data, ((row_lengths[0],) if len(row_lengths) == 1 and not nested else (len(row_lengths), row_lengths[0]))
+
+    def call(self, name, args):
+        np, a = self.np, args[0]
+        if self._is_scalar(a) and name != 'norm': raise TypeError(f"{name} requires a matrix argument")
+        if name == 'transpose': return a.T
+        if name == 'det': return float(np.linalg.det(a)) if np is not None else a.det()
+        if name == 'inv': return np.linalg.inv(a) if np is not None else a.inv()
+        if name == 'trace': return float(np.trace(a)) if np is not None else a.trace()
+        if name == 'solve': return np.linalg.solve(a, args[1]) if np is not None else a.solve(args[1])
+        if name == 'eig':
+            eigs = list(np.linalg.eigvals(a)) if np is not None else a.eigvals()
+            return sorted((complex(v) if isinstance(v, complex) or getattr(v, 'imag', 0) else float(v) for v in eigs),
+                          key=lambda v: (v.real, v.imag), reverse=True)
+        if name == 'norm':
+            if self._is_scalar(a): return abs(a)
+            ord = args[1] if len(args) > 1 else None
+            return float(np.linalg.norm(a, ord)) if np is not None else a.norm(ord)
+
+    @staticmethod
+    def format_number(v):
+        if isinstance(v, complex):
+            if abs(v.imag) < 1e-12 * max(1.0, abs(v.real)): v = v.real
+            else: return f"{MatrixEvaluator.format_number(v.real)}{'+' if v.imag >= 0 else '-'}{MatrixEvaluator.format_number(abs(v.imag))}j"
+        v = float(v)
+        if v == v and abs(v) != math.inf and abs(v - round(v)) < 1e-9 * max(1.0, abs(v)): return str(int(round(v)))
+        return f"{v:.10g}"
+
+    def format_result(self, value):
+        fmt = self.format_number
+        if isinstance(value, list): return ", ".join(fmt(v) for v in value)
+        if self._is_scalar(value): return fmt(value)
+        rows = value.tolist()
+        if self.tabular:
+            if len(value.shape) == 1: return "\t".join(fmt(v) for v in rows)
+            return "\n".join("\t".join(fmt(v) for v in row) for row in rows)
+        if len(value.shape) == 1: return "[" + ", ".join(fmt(v) for v in rows) + "]"
+        return "[" + ", ".join("[" + ", ".join(fmt(v) for v in row) + "]" for row in rows) + "]"
+
+# Number theory helpers (pure Python, integer-exact)
+_SMALL_PRIMES = [p for p in range(2, 1000) if all(p % d for d in range(2, math.isqrt(p) + 1))]
+_MR_BASES = (2, 3, 5, 7, 11, 13, 17, 19, 23, 29, 31, 37, 41) # Deterministic for n < 3.3e24
+_MAX_PRIMALITY_BITS = 3322 # ~1000 digits; a single modular exponentiation beyond this takes seconds and can't be interrupted
+
+def _check_deadline(deadline):
+    if deadline is not None and time.monotonic() > deadline: raise TimeoutError
+
+def _miller_rabin(n, a):
+    d, s = n - 1, 0
+    while d % 2 == 0: d //= 2; s += 1
+    x = pow(a, d, n)
+    if x == 1 or x == n - 1: return True
+    for _ in range(s - 1):
+        x = x * x % n
+        if x == n - 1: return True
+    return False
+
+def _jacobi(a, n):
+    a %= n; result = 1
+    while a:
+        while a % 2 == 0:
+            a //= 2
+            if n % 8 in (3, 5): result = -result
+        a, n = n, a
+        if a % 4 == 3 and n % 4 == 3: result = -result
+        a %= n
+    return result if n == 1 else 0
+
+def _strong_lucas(n, deadline=None):
+    # Strong Lucas probable-prime test with Selfridge parameters; together with base-2 Miller-Rabin this is BPSW.
+    if math.isqrt(n) ** 2 == n: return False
+    D = 5
+    while _jacobi(D, n) != -1: D = -D - 2 if D > 0 else -D + 2
+    P, Q = 1, (1 - D) // 4
+    d, s = n + 1, 0
+    while d % 2 == 0: d //= 2; s += 1
+    def half(v): v %= n; return (v + n if v & 1 else v) // 2 % n
+    U, V, Qk = 1, P, Q % n
+    for bit in bin(d)[3:]:
+        _check_deadline(deadline)
+        U, V, Qk = U * V % n, (V * V - 2 * Qk) % n, Qk * Qk % n
+        if bit == '1': U, V, Qk = half(P * U + V), half(D * U + P * V), Qk * Q % n
+    if U == 0 or V == 0: return True
+    for _ in range(s - 1):
+        V, Qk = (V * V - 2 * Qk) % n, Qk * Qk % n
+        if V == 0: return True
+    return False
+
+def is_prime(n, deadline=None):
+    # Raises TimeoutError once time.monotonic() passes deadline; callers cap n at _MAX_PRIMALITY_BITS.
+    if n < 2: return False
+    for p in _SMALL_PRIMES:
+        if n % p == 0: return n == p
+    if n < 1_000_000: return True
+    if n < 3_317_044_064_679_887_385_961_981: return all(_miller_rabin(n, a) for a in _MR_BASES)
+    return _miller_rabin(n, 2) and _strong_lucas(n, deadline)
+
+def next_prime(n, deadline=None):
+    if n < 2: return 2
+    candidate = n + 1 if n % 2 == 0 else n + 2
+    while not is_prime(candidate, deadline): candidate += 2; _check_deadline(deadline)
+    return candidate
+
+def _pollard_brent(n, deadline):
+    if n % 2 == 0: return 2
+    for c in range(1, 64):
+        y, r, q, g, m = 2, 1, 1, 1, 128
+        while g == 1:
+            x = y
+            for _ in range(r): y = (y * y + c) % n
+            k = 0
+            while k < r and g == 1:
+                ys = y
+                for _ in range(min(m, r - k)): y = (y * y + c) % n; q = q * abs(x - y) % n
+                g = math.gcd(q, n); k += m
+                if time.monotonic() > deadline: raise TimeoutError
+            r *= 2
+        if g == n:
+            g = 1
+            while g == 1: ys = (ys * ys + c) % n; g = math.gcd(abs(x - ys), n)
+        if g != n: return g
+    return None
+
+def factorize(n, time_budget_s=2.0):
+    # Returns ({prime: exponent}, [unresolved cofactors]) for n >= 2; leftovers are only non-empty on timeout or for
+    # cofactors too large to test for primality.
+    factors, leftovers = {}, []
+    for p in _SMALL_PRIMES:
+        if p * p > n: break
+        while n % p == 0: factors[p] = factors.get(p, 0) + 1; n //= p
+    deadline, stack = time.monotonic() + time_budget_s, [n] if n > 1 else []
+    while stack:
+        m = stack.pop()
+        if m.bit_length() > _MAX_PRIMALITY_BITS: leftovers.append(m); continue
+        try:
+            if is_prime(m, deadline): factors[m] = factors.get(m, 0) + 1; continue
+        except TimeoutError: leftovers.append(m); continue
+        root = math.isqrt(m)
+        if root * root == m: stack += [root, root]; continue
+        try: d = _pollard_brent(m, deadline)
+        except TimeoutError: d = None
+        if d is None: leftovers.append(m); continue
+        stack += [d, m // d]
+    return dict(sorted(factors.items())), sorted(leftovers)
+
+def totient(n, time_budget_s=2.0):
+    factors, leftovers = factorize(n, time_budget_s)
+    if leftovers: return None
+    for p in factors: n = n // p * (p - 1)
+    return n
+
+_INT_BINOPS = {ast.Add: operator.add, ast.Sub: operator.sub, ast.Mult: operator.mul, ast.Pow: operator.pow, ast.Mod: operator.mod}
+
+def eval_int_expr(text):
+    # Integer-only arithmetic (int literals, + - * ** % and parentheses), so arguments never pass through floats.
+    def walk(node):
+        if isinstance(node, ast.Constant):
+            if isinstance(node.value, int) and not isinstance(node.value, bool): return node.value
+            raise TypeError("non-integer literal")
+        if isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.UAdd, ast.USub)):
+            value = walk(node.operand); return -value if isinstance(node.op, ast.USub) else value
+        if isinstance(node, ast.BinOp) and type(node.op) in _INT_BINOPS:
+            left, right = walk(node.left), walk(node.right)
+            if isinstance(node.op, ast.Pow) and right < 0: raise TypeError("negative exponent")
+            if isinstance(node.op, ast.Pow) and right * max(left.bit_length(), 1) > 100_000: raise OverflowError("exponent too large")
+            return _INT_BINOPS[type(node.op)](left, right)
+        raise SyntaxError("unsupported integer expression")
+    return walk(ast.parse(text.strip().replace('^', '**'), mode='eval').body)
+
+class CurrencyRateTable:
+    # Rates are read from a local JSON file: {"base": "USD", "rates": {"EUR": 0.92, ...}}
+    # (units of each currency per 1 unit of base). No network I/O happens here.
+    def __init__(self, path, cache_ttl_s=300.0, stat_interval_s=2.0):
+        self.path = path
+        self.cache_ttl_s = cache_ttl_s
+        self.stat_interval_s = stat_interval_s
+        self.base = None
+        self.codes = {}                 # currency code -> index into self.rates
+        self.rates = array('d')         # compact rate storage, one double per currency
+        self._mtime = None
+        self._bad_mtime = None
+        self._next_stat = 0.0
+        self._cross_cache = {}          # (from, to) -> (rate, expires_at)
+        self._lock = Lock()
+
+    def _maybe_reload(self):
+        now = time.monotonic()
+        if now < self._next_stat and self._mtime is not None: return
+        self._next_stat = now + self.stat_interval_s
+        try: mtime = os.stat(self.path).st_mtime_ns
+        except OSError:
+            if self._mtime is None: raise FileNotFoundError(self.path)
+            return # Keep serving the last loaded rates while the sync job replaces the file
+        if mtime == self._mtime or mtime == self._bad_mtime: return
+        try: base, codes, rates = self._load()
+        except (OSError, ValueError) as e:
+            if self._mtime is None: raise ValueError(str(e)) from e
+            self._bad_mtime = mtime # Keep serving the last good table; retried once the file changes again
+            logging.getLogger(__name__).warning(f"Ignoring invalid currency rates file {self.path}: {e}")
+            return
+        self.base, self.codes, self.rates, self._mtime, self._bad_mtime = base, codes, rates, mtime, None
+        self._cross_cache.clear()
+
+    def _load(self):
+        with open(self.path, 'r') as f: data = json.load(f)
+        if not isinstance(data, dict) or not isinstance(data.get("base"), str) or not isinstance(data.get("rates"), dict):
+            raise ValueError("expected {\"base\": \"XXX\", \"rates\": {...}}")
+        base = data["base"].upper()
+        codes, rates = {base: 0}, array('d', [1.0])
+        for code, rate in data["rates"].items():
+            code = code.upper()
+            if code == base: continue
+            try: rate = float(rate)
+            except (TypeError, ValueError): raise ValueError(f"Non-numeric rate for {code}")
+            if not rate > 0 or rate == math.inf: raise ValueError(f"Invalid rate for {code}")
+            codes[code] = len(rates); rates.append(rate)
+        return base, codes, rates
+
+    def rate(self, from_code, to_code):
+        from_code, to_code = from_code.upper(), to_code.upper()
+        with self._lock:
+            self._maybe_reload()
+            key = (from_code, to_code)
+            cached = self._cross_cache.get(key)
+            now = time.monotonic()
+            if cached and cached[1] > now: return cached[0]
+            for code in key:
+                if code not in self.codes: raise KeyError(code)
+            # Cross rate through the base currency: from -> base -> to
+            cross = self.rates[self.codes[to_code]] / self.rates[self.codes[from_code]]
+            self._cross_cache[key] = (cross, now + self.cache_ttl_s)
+            return cross
+
+    def convert(self, amount, from_code, to_code):
+        return amount * self.rate(from_code, to_code)
+
+class ResultCache:
+    # Disk-backed, content-addressed cache for expensive (symbolic) results. Entries are keyed by a hash of
+    # handler + library version + normalized expression, bounded LRU-style, and dropped when the library version changes.
+    SCHEMA_VERSION = 1
+
+    def __init__(self, path, max_entries=500):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._conn = None
+        self._checked_versions = set()
+        self._lock = Lock()
+        self.logger = logging.getLogger(__name__)
+
+    def _connect(self):
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, handler TEXT, lib_version TEXT, "
+                               "result TEXT, sympy_srepr TEXT, last_used REAL)")
+        return self._conn
+
+    def _key(self, handler, expression, lib_version):
+        return hashlib.sha256(f"{self.SCHEMA_VERSION}\0{handler}\0{lib_version}\0{expression}".encode("utf-8")).hexdigest()
+
+    def _invalidate_stale(self, conn, handler, lib_version):
+        if (handler, lib_version) in self._checked_versions: return
+        removed = conn.execute("DELETE FROM entries WHERE handler = ? AND lib_version != ?", (handler, lib_version)).rowcount
+        conn.commit(); self._checked_versions.add((handler, lib_version))
+        if removed: self.logger.info(f"Result cache: dropped {removed} '{handler}' entries from another library version.")
+
+    def get(self, handler, expression, lib_version):
+        with self._lock:
+            try:
+                conn = self._connect(); self._invalidate_stale(conn, handler, lib_version)
+                key = self._key(handler, expression, lib_version)
+                row = conn.execute("SELECT result, sympy_srepr FROM entries WHERE key = ?", (key,)).fetchone()
+                if row is None: self.misses += 1; return None
+                conn.execute("UPDATE entries SET last_used = ? WHERE key = ?", (time.time(), key)); conn.commit()
+                self.hits += 1; return row
+            except sqlite3.Error as e: self.logger.error(f"Result cache read failed: {e}"); self.misses += 1; return None
+
+    def put(self, handler, expression, lib_version, result, sympy_srepr=None):
+        with self._lock:
+            try:
+                conn = self._connect()
+                conn.execute("INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?)",
+                             (self._key(handler, expression, lib_version), handler, lib_version, result, sympy_srepr, time.time()))
+                overflow = conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0] - self.max_entries
+                if overflow > 0:
+                    conn.execute("DELETE FROM entries WHERE key IN (SELECT key FROM entries ORDER BY last_used ASC LIMIT ?)", (overflow,))
+                conn.commit()
+            except sqlite3.Error as e: self.logger.error(f"Result cache write failed: {e}")
+
+    def stats(self):
+        total = self.hits + self.misses
+        return f"{self.hits} hits / {self.misses} misses" + (f" ({100.0 * self.hits / total:.0f}% hit rate)" if total else "")
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None: self._conn.close(); self._conn = None
+
+class HistoryTextPool:
+    # Shares repeated history strings so equal expressions/results are stored once. Unlike sys.intern (immortal on
+    # CPython 3.12), the pool only holds strings still referenced by a history record, so it never adds to the history's size.
+    def __init__(self):
+        self._texts = {}
+
+    def share(self, text):
+        return self._texts.setdefault(text, text)
+
+    def retain(self, records):
+        # Drops strings whose last record was evicted.
+        self._texts = {value: value for record in records for value in record.text_values()}
+
+    def clear(self):
+        self._texts.clear()
+
+class HistoryRecord:
+    # One history entry. Text goes through a shared pool so repeated expressions/results share storage, oversized text is
+    # kept as a truncated preview (plus a digest for the expression), and sympy solutions stay as srepr strings until needed
+    # (dropped when longer than max_srepr_chars, since a truncated srepr can't be rehydrated).
+    __slots__ = ('timestamp', 'expression', 'result', 'expr_digest', 'expr_length', 'result_length', 'sympy_srepr')
+
+    def __init__(self, expression, result, sympy_srepr=None, max_text_chars=500, max_srepr_chars=2000, timestamp=None, share=lambda text: text):
+        self.timestamp = time.time() if timestamp is None else timestamp
+        self.expr_length, self.result_length = len(expression), len(result)
+        self.expr_digest = share(hashlib.sha1(expression.encode("utf-8")).hexdigest()) if len(expression) > max_text_chars else None
+        self.expression = share(self._preview(expression, max_text_chars))
+        self.result = share(self._preview(result, max_text_chars))
+        self.sympy_srepr = share(sympy_srepr) if sympy_srepr and len(sympy_srepr) <= max_srepr_chars else None
+
+    def text_values(self):
+        return [v for v in (self.expression, self.result, self.expr_digest, self.sympy_srepr) if v is not None]
+
+    @staticmethod
+    def _preview(text, max_chars):
+        return text if len(text) <= max_chars else text[:max_chars - 1] + "…"
+
+    @property
+    def expression_truncated(self): return self.expr_digest is not None
+
+    @property
+    def result_truncated(self): return self.result_length > len(self.result)
+
+    @property
+    def timestamp_str(self): return time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(self.timestamp))
+
+    @property
+    def sympy_obj(self):
+        # Rehydrated on demand and not kept, so idle history holds only the compact string form.
+        if not self.sympy_srepr: return None
+        import sympy
+        return sympy.sympify(self.sympy_srepr)
+
+def _symbolic_solve_worker(conn):
+    import sympy
+    conn.send("ready")
+    while True:
+        try: residuals, symbols = conn.recv()
+        except (EOFError, OSError): return
+        try: conn.send(("ok", sympy.solve(residuals, symbols, dict=True)))
+        except Exception as e: conn.send(("error", f"{type(e).__name__}: {e}"))
+
+class SymbolicSolver:
+    # Runs sympy.solve in a reusable child process. sympy.solve cannot be interrupted in-process, so a solve that
+    # exceeds its budget kills the worker (a fresh one is started on the next call) instead of leaking a busy thread.
+    def __init__(self, startup_timeout_s=60.0):
+        self.startup_timeout_s = startup_timeout_s
+        self._ctx = multiprocessing.get_context("spawn") # fork is unsafe with the Tk and monitor threads running
+        self._process = None
+        self._conn = None
+        self._lock = Lock()
+
+    def _ensure_worker(self):
+        if self._process is not None and self._process.is_alive(): return
+        self._terminate()
+        parent_conn, child_conn = self._ctx.Pipe()
+        self._process = self._ctx.Process(target=_symbolic_solve_worker, args=(child_conn,), daemon=True)
+        self._process.start(); child_conn.close(); self._conn = parent_conn
+        # Worker start-up (interpreter + sympy import) is not charged to the solve's time budget.
+        if not parent_conn.poll(self.startup_timeout_s) or parent_conn.recv() != "ready":
+            self._terminate(); raise RuntimeError("Symbolic solver process failed to start")
+
+    def warm_up(self):
+        try:
+            with self._lock: self._ensure_worker()
+        except Exception as e: logging.getLogger(__name__).warning(f"Symbolic solver warm-up failed: {e}")
+
+    def solve(self, residuals, symbols, timeout_s):
+        with self._lock:
+            self._ensure_worker()
+            try:
+                self._conn.send((residuals, symbols))
+                if not self._conn.poll(timeout_s):
+                    self._terminate(); Thread(target=self.warm_up, daemon=True).start() # Replacement starts off the clipboard path
+                    raise TimeoutError
+                status, payload = self._conn.recv()
+            except (EOFError, OSError) as e: self._terminate(); raise RuntimeError(f"Symbolic solver process died: {e}")
+        if status == "error": raise RuntimeError(payload)
+        return payload
+
+    def _terminate(self):
+        if self._process is not None:
+            if self._process.is_alive(): self._process.kill()
+            self._process.join(timeout=1.0)
+        if self._conn is not None: self._conn.close()
+        self._process, self._conn = None, None
+
+    def close(self):
+        with self._lock: self._terminate()
+
 class ClipboardCalculator:
     def __init__(self):
         # For detailed debugging, change level to logging.DEBUG
@@ -55,6 +835,8 @@ class ClipboardCalculator:
             self.logger.warning("python-dateutil library not found. Advanced date parsing will be unavailable. (pip install python-dateutil)")
         if not statistics:
             self.logger.warning("statistics library not found. Statistical functions will be unavailable. (pip install statistics)")
+        if not numpy:
+            self.logger.info("NumPy not found. Matrix mode will use the pure-Python fallback. (pip install numpy)")
 
         self.settings_file = "CalcX_settings.json"
         self.settings = self.load_settings()
@@ -69,12 +851,19 @@ class ClipboardCalculator:
         self.stop_event = Event()
         self.monitoring_paused = False
         self.calculation_history = deque(maxlen=self.settings.get("max_history_items", 20))
+        self.history_text_pool = HistoryTextPool()
         self.x_offset = 0
         self.y_offset = 0
         self.sympy_notified = False
         self.dateutil_notified = not dateutil_parser
         self.stats_notified = not statistics
-        self._last_sympy_solution_obj = None
+        self._last_sympy_solution_srepr = None
+        self._residual_fn_cache = OrderedDict() # normalized equation -> lambdified residuals/Jacobian
+        self.symbolic_solver = SymbolicSolver() # Worker process starts on the first equation, not at launch
+        self.result_cache = ResultCache(self.settings.get("result_cache_file", "CalcX_cache.sqlite3"),
+                                        max_entries=self.settings.get("result_cache_max_entries", 500))
+        self.currency_rates = CurrencyRateTable(self.settings.get("currency_rates_file", "CalcX_rates.json"),
+                                                cache_ttl_s=self.settings.get("currency_cache_ttl_s", 300))
 
         self.overlay = tk.Toplevel(self.root)
         self.overlay.attributes('-topmost', self.settings.get("always_on_top", True))
@@ -110,6 +899,10 @@ class ClipboardCalculator:
             self.monitor_thread = Thread(target=self.monitor_clipboard)
             self.monitor_thread.daemon = True
             self.monitor_thread.start()
+            if self.settings.get("currency_rates_url"):
+                self.rates_sync_thread = Thread(target=self.sync_currency_rates)
+                self.rates_sync_thread.daemon = True
+                self.rates_sync_thread.start()
         else:
             self.status_var.set("Error: Pyperclip not found!")
             self.logger.error("Pyperclip not found, clipboard monitoring disabled.")
@@ -157,7 +950,13 @@ class ClipboardCalculator:
             "overlay_button_bg_color": "lightyellow", "overlay_button_active_bg_color": "lightgrey",
             "always_on_top": True, "auto_copy_result": False,
             "monitoring_interval_ms": 500, "max_history_items": 20,
-            "overlay_geometry": "+50+50", "overlay_opacity": 1.0, "theme_name": "Yellowish"
+            "overlay_geometry": "+50+50", "overlay_opacity": 1.0, "theme_name": "Yellowish",
+            "currency_rates_file": "CalcX_rates.json", "currency_rates_url": "",
+            "currency_cache_ttl_s": 300, "currency_sync_interval_s": 3600,
+            "equation_symbolic_timeout_s": 2.0,
+            "result_cache_file": "CalcX_cache.sqlite3", "result_cache_max_entries": 500,
+            "number_theory_time_budget_s": 2.0,
+            "max_history_bytes": 1048576, "history_max_text_chars": 500, "history_max_srepr_chars": 2000
         }
         try:
             if os.path.exists(self.settings_file):
@@ -199,6 +998,7 @@ class ClipboardCalculator:
             self.overlay.attributes('-topmost', self.settings.get("always_on_top", True))
         if self.calculation_history.maxlen != self.settings.get("max_history_items", 20):
              self.calculation_history = deque(self.calculation_history, maxlen=self.settings.get("max_history_items", 20))
+             self.history_text_pool.retain(self.calculation_history)
         self.auto_resize_overlay()
 
     def start_move(self, event): self.x_offset, self.y_offset = event.x, event.y
@@ -239,7 +1039,7 @@ class ClipboardCalculator:
                             is_error = isinstance(eval_result, str) and eval_result.startswith("Error:")
                             is_info = isinstance(eval_result, str) and eval_result.startswith("Info:")
                             is_complex_type = isinstance(eval_result, str) and ( 
-                                eval_result.startswith("x =") or "->" in eval_result or "days" in eval_result.lower() or
+                                re.match(r"[a-z_]\w* = ", eval_result) is not None or "\n" in eval_result or "->" in eval_result or "days" in eval_result.lower() or
                                 re.match(r"\d{4}-\d{2}-\d{2}", eval_result) is not None or 
                                 re.match(r"(0x[0-9a-fA-F]+|0b[01]+|0o[0-7]+)", eval_result, re.IGNORECASE) is not None 
                             )
@@ -248,11 +1048,11 @@ class ClipboardCalculator:
                             elif is_complex_type:
                                 self.root.after(0, self.update_result_display, cliptext, eval_result, False, True)
                                 self.add_to_history(cliptext, eval_result)
-                                if self.settings.get("auto_copy_result", False) and pyperclip: pyperclip.copy(str(eval_result))
+                                if self.settings.get("auto_copy_result", False) and pyperclip: pyperclip.copy(str(eval_result)); self.last_clip = str(eval_result).strip()
                             else: 
                                 self.root.after(0, self.update_result_display, cliptext, eval_result)
                                 self.add_to_history(cliptext, eval_result)
-                                if self.settings.get("auto_copy_result", False) and pyperclip: pyperclip.copy(str(eval_result))
+                                if self.settings.get("auto_copy_result", False) and pyperclip: pyperclip.copy(str(eval_result)); self.last_clip = str(eval_result).strip()
             except pyperclip.PyperclipException as e:
                 self.logger.error(f"Pyperclip error: {e}. Clipboard access might be unavailable.")
                 self.root.after(0, self.update_result_display, "Error", "Clipboard access issue.", True)
@@ -265,8 +1065,9 @@ class ClipboardCalculator:
         self.logger.info("Clipboard monitoring stopped.")
 
     def looks_like_math_or_query(self, text):
-        if not text or len(text) > 250: return False
-        query_pattern = r'^[a-zA-Z0-9\s\.,\+\-\*/%^=√°\(\)\[\]\{\}:_]+$' 
+        # Matrix literals and pasted blocks get the larger limit; anything else this long is not a calculator query.
+        if not text or len(text) > 20000 or (len(text) > 250 and not MatrixEvaluator.looks_like_matrix(text)): return False
+        query_pattern = r'^[a-zA-Z0-9\s\.,;\+\-\*/@%^=√°\(\)\[\]\{\}:_]+$' 
         if not re.match(query_pattern, text):
             self.logger.debug(f"'{text}' did not match basic query pattern.")
             return False
@@ -280,7 +1081,8 @@ class ClipboardCalculator:
             'today', 'days', 'weeks', 'months', 'years', 'between', 'now', 'yesterday', 
             'tomorrow', 'ago', 'hence',
             'mean', 'median', 'mode', 'stdev', 'std', 'variance', 'avg',
-            'hex', 'bin', 'oct', 'dec' 
+            'hex', 'bin', 'oct', 'dec',
+            'isprime', 'factor', 'powmod', 'ncr', 'npr', 'nextprime', 'totient', 'phi'
         ]
         
         has_operator_char = any(op in text for op in '+-*/%^=√')
@@ -299,8 +1101,8 @@ class ClipboardCalculator:
             val = float(solution_expr.evalf(n=15)) if isinstance(solution_expr, sympy.Expr) else float(solution_expr)
             if val == int(val): return str(int(val))
             for i in range(1, 7): 
-                if abs(val - round(val, i)) < 1e-9: return f"{round(val, i):.10g}".rstrip('0').rstrip('.')
-            return f"{val:.10g}".rstrip('0').rstrip('.') if abs(val) > 1e-7 and abs(val) < 1e7 else f"{val:.6e}"
+                if abs(val - round(val, i)) < 1e-9: return f"{round(val, i):.10g}"
+            return f"{val:.10g}" if abs(val) > 1e-7 and abs(val) < 1e7 else f"{val:.6e}"
         except: return str(solution_expr)
 
     def safe_eval_router(self, expr_str_input_orig: str):
@@ -308,12 +1110,22 @@ class ClipboardCalculator:
         expr_lower = expr_str.lower()
         self.logger.debug(f"Routing: '{expr_str}'")
 
-        # 1. Equation Solving
-        if '=' in expr_str and 'x' in expr_lower:
+        # 1. Equation Solving (single equations and ';'-separated systems)
+        if '=' in expr_str and re.search(r'[a-z_]', expr_lower):
             self.logger.debug("Attempting equation handler.")
             return self._handle_equation_solving(expr_str)
 
-        # 2. Base Conversions
+        # 2. Matrix / vector arithmetic (bracket literals or pasted tab/newline blocks)
+        if MatrixEvaluator.looks_like_matrix(expr_str):
+            self.logger.debug("Attempting matrix handler.")
+            return self._handle_matrix_expression(expr_str)
+
+        # 3. Number theory (integer-exact, bypasses eval)
+        if self._is_number_theory_call(expr_lower):
+            self.logger.debug("Attempting number theory handler.")
+            return self._handle_number_theory(expr_str)
+
+        # 4. Base Conversions
         base_keywords_check = ['hex', 'bin', 'oct', 'dec']
         # Check for patterns like "hex(...)", "0x...", or "... bin to dec"
         if any(expr_lower.startswith(kw + "(") for kw in base_keywords_check) or \
@@ -322,7 +1134,7 @@ class ClipboardCalculator:
             self.logger.debug("Attempting base conversion handler.")
             return self._handle_base_conversion(expr_str)
         
-        # 3. Date Calculations
+        # 5. Date Calculations
         date_keywords_check = ['today', 'now', 'yesterday', 'tomorrow', 'days', 'weeks', 'months', 'years', 'between', 'ago', 'hence']
         if any(re.search(r'\b' + kw + r'\b', expr_lower) for kw in date_keywords_check) or \
            re.search(r'\d{4}-\d{2}-\d{2}', expr_str) or re.search(r'\d{1,2}[/-]\d{1,2}[/-]\d{2,4}', expr_str):
@@ -332,11 +1144,12 @@ class ClipboardCalculator:
             elif not self.dateutil_notified: self.dateutil_notified = True; return "Info: python-dateutil needed for date calculations."
             else: return "Error: python-dateutil not available."
 
-        # 4. Currency Conversion (placeholder) - Keep this low priority
+        # 6. Currency Conversion (offline rate file) - Keep this low priority
         if re.search(r"\d+\s*[A-Z]{3}\s*(?:to|in)\s*[A-Z]{3}", expr_str, re.IGNORECASE): # "to" or "in"
-            return "Info: Currency conversion via API is planned."
+            self.logger.debug("Attempting currency conversion handler.")
+            return self._handle_currency_conversion(expr_str)
 
-        # 5. Statistical functions
+        # 7. Statistical functions
         stat_keywords_check = ['mean', 'median', 'mode', 'stdev', 'std', 'variance', 'avg']
         if any(expr_lower.startswith(kw + "(") or expr_lower.startswith(kw + " ") for kw in stat_keywords_check):
             if statistics:
@@ -351,32 +1164,275 @@ class ClipboardCalculator:
 
     def _handle_equation_solving(self, expr_str):
         self.logger.debug(f"Equation handler received: '{expr_str}'")
+        sympy = None
         try:
+            # The cache is keyed on the installed sympy version read from package metadata, so a hit (even right after a
+            # restart) returns without paying for the sympy import.
+            try: sympy_version = importlib.metadata.version("sympy")
+            except importlib.metadata.PackageNotFoundError: import sympy; sympy_version = sympy.__version__
+            cache_expr = re.sub(r'\s*([=;+\-*/^(),])\s*', r'\1', re.sub(r'\s+', ' ', expr_str.strip().lower()))
+            cached = self.result_cache.get("equation", cache_expr, sympy_version)
+            if cached is not None:
+                result, self._last_sympy_solution_srepr = cached
+                self.logger.debug(f"Result cache hit for '{cache_expr}'"); return result
             import sympy
-            expr_for_sympy = expr_str.lower()
-            expr_for_sympy = re.sub(r'√\s*(\([^)]+\)|[a-zA-Z_0-9.x]+)', r'sqrt(\1)', expr_for_sympy)
-            expr_for_sympy = expr_for_sympy.replace('^', '**')
-            lhs_str, rhs_str = expr_for_sympy.split('=', 1) 
-            x_sym = sympy.symbols('x')
-            sympy_context = {'x': x_sym, 'pi': sympy.pi, 'e': sympy.E, 'sqrt': sympy.sqrt, 'log': sympy.log, 'ln': sympy.log, 
-                             'sin': sympy.sin, 'cos': sympy.cos, 'tan': sympy.tan, 'asin': sympy.asin, 'acos': sympy.acos, 
-                             'atan': sympy.atan, 'abs': sympy.Abs, 'factorial': sympy.factorial, 'pow': sympy.Pow,
-                             'rad': lambda dv: sympy.sympify(dv) * sympy.pi / 180, 'deg': lambda rv: sympy.sympify(rv) * 180 / sympy.pi}
-            from sympy.parsing.sympy_parser import parse_expr, standard_transformations, implicit_multiplication_application
-            transformations = standard_transformations + (implicit_multiplication_application,)
-            lhs = parse_expr(lhs_str.strip(), local_dict=sympy_context, transformations=transformations)
-            rhs = parse_expr(rhs_str.strip(), local_dict=sympy_context, transformations=transformations)
-            solutions = sympy.solve(sympy.Eq(lhs, rhs), x_sym)
-            if solutions: self._last_sympy_solution_obj = solutions[0]; return f"x = {self._format_sympy_solution(solutions[0])}"
-            else: self._last_sympy_solution_obj = None; return "Error: No solution found"
+            residuals, symbols = self._parse_equation_system(expr_str)
+            if not symbols:
+                self._last_sympy_solution_srepr = None
+                return "Info: Equation holds for all values" if all(r == 0 for r in residuals) else "Error: No solution found"
+            solutions, numeric = self._solve_symbolic_with_timeout(residuals, symbols), False
+            if not solutions and len(residuals) == len(symbols):
+                self.logger.debug("Symbolic solve gave nothing; trying numeric root finding.")
+                (solutions, truncated), numeric = self._solve_numeric(residuals, symbols), True
+            if solutions:
+                self._last_sympy_solution_srepr = sympy.srepr(solutions)
+                result = self._format_solution_sets(solutions, symbols) + (", …" if numeric and truncated else "") + (" (numeric)" if numeric else "")
+                self.result_cache.put("equation", cache_expr, sympy_version, result, self._last_sympy_solution_srepr)
+                return result
+            else: self._last_sympy_solution_srepr = None; return "Error: No solution found"
         except ImportError:
-            self._last_sympy_solution_obj = None
+            self._last_sympy_solution_srepr = None
             if not self.sympy_notified: self.sympy_notified = True; return "Error: Sympy needed for equations (pip install sympy)"
             return "Error: Sympy not available" 
-        except (SyntaxError, TypeError, sympy.SympifyError) as e:
-            self._last_sympy_solution_obj = None; self.logger.error(f"Sympy parsing error for '{expr_str}': {e}"); return f"Error: Invalid equation syntax ({type(e).__name__})"
+        except (SyntaxError, TypeError, getattr(sympy, 'SympifyError', SyntaxError)) as e:
+            self._last_sympy_solution_srepr = None; self.logger.error(f"Sympy parsing error for '{expr_str}': {e}"); return f"Error: Invalid equation syntax ({type(e).__name__})"
+        except Exception as e:
+            self._last_sympy_solution_srepr = None; self.logger.error(f"Sympy error solving '{expr_str}': {e}", exc_info=True); return f"Error: Equation solving failed ({type(e).__name__})"
+
+    def _parse_equation_system(self, expr_str):
+        # Equations are separated by ';' or newlines; every free symbol is an unknown.
+        import sympy
+        from sympy.parsing.sympy_parser import parse_expr, standard_transformations, implicit_multiplication_application
+        sympy_context = {'pi': sympy.pi, 'e': sympy.E, 'sqrt': sympy.sqrt, 'log': sympy.log, 'ln': sympy.log, 
+                         'sin': sympy.sin, 'cos': sympy.cos, 'tan': sympy.tan, 'asin': sympy.asin, 'acos': sympy.acos, 
+                         'atan': sympy.atan, 'abs': sympy.Abs, 'factorial': sympy.factorial, 'pow': sympy.Pow, 'exp': sympy.exp,
+                         'rad': lambda dv: sympy.sympify(dv) * sympy.pi / 180, 'deg': lambda rv: sympy.sympify(rv) * 180 / sympy.pi}
+        transformations = standard_transformations + (implicit_multiplication_application,)
+        residuals = []
+        for eq_str in re.split(r'[;\n]+', expr_str.lower()):
+            eq_str = eq_str.strip()
+            if not eq_str: continue
+            if eq_str.count('=') != 1: raise SyntaxError(f"Expected exactly one '=' in '{eq_str}'")
+            eq_str = re.sub(r'√\s*(\([^)]+\)|[a-zA-Z_0-9.]+)', r'sqrt(\1)', eq_str).replace('^', '**')
+            lhs_str, rhs_str = eq_str.split('=')
+            lhs = parse_expr(lhs_str.strip(), local_dict=sympy_context, transformations=transformations)
+            rhs = parse_expr(rhs_str.strip(), local_dict=sympy_context, transformations=transformations)
+            residuals.append(sympy.sympify(lhs - rhs))
+        symbols = sorted(set().union(*(r.free_symbols for r in residuals)), key=lambda s: s.name)
+        return residuals, symbols
+
+    def _solve_symbolic_with_timeout(self, residuals, symbols):
+        try: return self.symbolic_solver.solve(residuals, symbols, self.settings.get("equation_symbolic_timeout_s", 2.0))
+        except TimeoutError: self.logger.info("Symbolic solve timed out, falling back to numeric."); return []
+        except Exception as e: self.logger.debug(f"Symbolic solve failed: {e}"); return []
+
+    def _compile_residuals(self, residuals, symbols):
+        # Numeric literals are lifted into parameters so equations differing only in constants share one compiled function.
+        import sympy
+        params, consts = [], []
+        def templatize(node, in_exponent=False):
+            if isinstance(node, sympy.Number) and not in_exponent:
+                param = sympy.Symbol(f"_c{len(params)}"); params.append(param); consts.append(float(node)); return param
+            if not node.args: return node
+            if isinstance(node, sympy.Pow): return sympy.Pow(templatize(node.base), templatize(node.exp, True), evaluate=False)
+            return node.func(*[templatize(a, in_exponent) for a in node.args], evaluate=False)
+        templates = [templatize(r) for r in residuals]
+        cache_key = (sympy.srepr(tuple(templates)), tuple(s.name for s in symbols))
+        compiled = self._residual_fn_cache.get(cache_key)
+        if compiled is None:
+            # Each part may be unprintable for math (e.g. the derivative of Abs); callers skip the methods needing it.
+            try: residual_fn = sympy.lambdify(symbols + params, templates, modules="math")
+            except Exception as e: self.logger.debug(f"Residuals not lambdifiable: {e}"); residual_fn = None
+            try: jacobian_fn = sympy.lambdify(symbols + params, [[sympy.diff(t, s) for s in symbols] for t in templates], modules="math")
+            except Exception as e: self.logger.debug(f"Jacobian not lambdifiable, skipping Newton: {e}"); jacobian_fn = None
+            compiled = (residual_fn, jacobian_fn)
+            self._residual_fn_cache[cache_key] = compiled
+            if len(self._residual_fn_cache) > 64: self._residual_fn_cache.popitem(last=False)
+        else: self._residual_fn_cache.move_to_end(cache_key)
+        return compiled[0], compiled[1], consts
+
+    @staticmethod
+    def _solve_linear(matrix, rhs):
+        # Gaussian elimination with partial pivoting; systems here are a handful of unknowns.
+        n = len(rhs); a = [list(map(float, row)) + [float(b)] for row, b in zip(matrix, rhs)]
+        for col in range(n):
+            pivot = max(range(col, n), key=lambda r: abs(a[r][col]))
+            if abs(a[pivot][col]) < 1e-300: return None
+            a[col], a[pivot] = a[pivot], a[col]
+            for r in range(col + 1, n):
+                factor = a[r][col] / a[col][col]
+                if factor: a[r] = [v - factor * p for v, p in zip(a[r], a[col])]
+        xs = [0.0] * n
+        for r in range(n - 1, -1, -1): xs[r] = (a[r][n] - sum(a[r][c] * xs[c] for c in range(r + 1, n))) / a[r][r]
+        return xs
+
+    def _newton(self, f, jac, consts, start, tol=1e-12, max_iter=100):
+        # Stops on a small residual only once the step is small too: near a multiple root (e.g. tan(x) = x at 0) the
+        # residual drops below tol long before x does, which would otherwise surface as a spurious extra root.
+        xs = list(start)
+        for _ in range(max_iter):
+            try: fx = f(*xs, *consts)
+            except (ValueError, ZeroDivisionError, OverflowError, TypeError): return None
+            if any(isinstance(v, complex) for v in fx): return None
+            if max(abs(v) for v in fx) == 0.0: return xs
+            try: step = self._solve_linear(jac(*xs, *consts), [-v for v in fx])
+            except (ValueError, ZeroDivisionError, OverflowError, TypeError): return None
+            if step is None: return None
+            xs = [x + dx for x, dx in zip(xs, step)]
+            if max(abs(v) for v in fx) < tol and all(abs(dx) <= 1e-9 * max(1.0, abs(x)) for x, dx in zip(xs, step)): return xs
+        try: fx = f(*xs, *consts)
+        except (ValueError, ZeroDivisionError, OverflowError, TypeError): return None
+        return xs if not any(isinstance(v, complex) for v in fx) and max(abs(v) for v in fx) < 1e-9 else None
+
+    def _bracket_roots(self, f, consts, lo=-100.0, hi=100.0, steps=2000):
+        # Scan for sign changes and bisect each bracket; residuals that blow up at a pole are rejected afterwards.
+        def g(x):
+            try: v = f(x, *consts)[0]
+            except (ValueError, ZeroDivisionError, OverflowError, TypeError): return None
+            return None if isinstance(v, complex) or v != v else v
+        roots, width = [], (hi - lo) / steps
+        prev_x, prev_v = lo, g(lo)
+        for i in range(1, steps + 1):
+            x = lo + i * width; v = g(x)
+            if prev_v is not None and v is not None and (prev_v == 0 or prev_v * v < 0):
+                a, b, fa = prev_x, x, prev_v
+                for _ in range(100):
+                    mid = 0.5 * (a + b); fm = g(mid)
+                    if fm is None: break
+                    if fa * fm <= 0: b = mid
+                    else: a, fa = mid, fm
+                root = 0.5 * (a + b); fr = g(root)
+                if fr is not None and abs(fr) < 1e-9: roots.append(root)
+            prev_x, prev_v = x, v
+        return roots
+
+    def _solve_numeric(self, residuals, symbols, max_roots=6):
+        # Returns (solutions, truncated): the max_roots roots nearest the origin in ascending order, and whether any were dropped.
+        import sympy
+        f, jac, consts = self._compile_residuals(residuals, symbols)
+        found = []
+        def add(xs):
+            if xs is not None: xs = [0.0 if abs(v) < 1e-12 else v for v in xs] # Float noise around an exact zero root
+            if xs is not None and not any(all(abs(a - b) <= 1e-7 * max(1.0, abs(a)) for a, b in zip(xs, prev)) for prev in found): found.append(xs)
+        if len(symbols) == 1 and f is not None:
+            for root in self._bracket_roots(f, consts): add([root])
+        if f is not None and jac is not None:
+            for s in [0.5, 1.0, -1.0, 2.0, -2.0, 0.1, 10.0, -10.0]:
+                add(self._newton(f, jac, consts, [s + 0.1 * i for i in range(len(symbols))]))
+                if len(found) >= max_roots: break
+        if not found:
+            try: add([float(v) for v in sympy.nsolve(residuals, symbols, [1.0] * len(symbols))])
+            except Exception as e: self.logger.debug(f"nsolve failed: {e}")
+        found.sort(key=lambda xs: math.fsum(v * v for v in xs))
+        kept = sorted(found[:max_roots])
+        return [{s: sympy.Float(v, 15) for s, v in zip(symbols, xs)} for xs in kept], len(found) > max_roots
+
+    def _format_solution_sets(self, solutions, symbols):
+        if len(symbols) == 1 and all(len(sol) == 1 for sol in solutions):
+            return f"{symbols[0]} = " + ", ".join(self._format_sympy_solution(sol[symbols[0]]) for sol in solutions)
+        return "; ".join(", ".join(f"{s} = {self._format_sympy_solution(sol[s])}" for s in symbols if s in sol) for sol in solutions)
+
+    def _handle_matrix_expression(self, expr_str):
+        self.logger.debug(f"Matrix handler received: '{expr_str}'")
+        evaluator = MatrixEvaluator(use_numpy=numpy is not None)
+        try:
+            value = evaluator.evaluate(expr_str.strip())
+            if evaluator.tabular and evaluator.is_block(expr_str):
+                shape = "x".join(str(n) for n in (value.shape if len(value.shape) == 2 else (1, value.shape[0])))
+                if len(value.shape) == 2 and value.shape[0] == value.shape[1]:
+                    return f"Info: {shape} matrix, det = {evaluator.format_number(evaluator.call('det', [value]))}"
+                return f"Info: {shape} matrix, norm = {evaluator.format_number(evaluator.call('norm', [value]))}"
+            return evaluator.format_result(value)
+        except ZeroDivisionError: return "Error: Matrix is singular"
+        except (SyntaxError, NameError, TypeError) as e: self.logger.debug(f"Matrix parse error for '{expr_str}': {e}"); return f"Error: {e}"
+        except ValueError as e: return f"Error: {str(e).strip()}"
         except Exception as e:
-            self._last_sympy_solution_obj = None; self.logger.error(f"Sympy error solving '{expr_str}': {e}", exc_info=True); return f"Error: Equation solving failed ({type(e).__name__})"
+            if numpy is not None and isinstance(e, numpy.linalg.LinAlgError): return f"Error: {e}"
+            self.logger.error(f"Matrix error '{expr_str}': {e}", exc_info=True); return f"Error: Matrix calculation failed ({type(e).__name__})"
+
+    def _is_number_theory_call(self, expr_lower):
+        # Only a single call spanning the whole input, e.g. not "factorial(5) + factorial(3)", which eval handles.
+        m = re.match(r"(isprime|factor|factorize|powmod|ncr|npr|nextprime|totient|phi|factorial)\s*\(", expr_lower)
+        if not m: return False
+        depth = 0
+        for i in range(m.end() - 1, len(expr_lower)):
+            depth += (expr_lower[i] == '(') - (expr_lower[i] == ')')
+            if depth == 0: return i == len(expr_lower) - 1
+        return False
+
+    def _split_call_args(self, args_str):
+        args, depth, current = [], 0, ""
+        for ch in args_str:
+            if ch == ',' and depth == 0: args.append(current.strip()); current = ""; continue
+            depth += (ch == '(') - (ch == ')'); current += ch
+        if current.strip(): args.append(current.strip())
+        return args
+
+    def _format_huge_int_estimate(self, log10_value):
+        # For results too large to build or print (CPython caps int->str at 4300 digits), report mantissa/exponent from logs.
+        exponent = math.floor(log10_value)
+        return f"{10 ** (log10_value - exponent):.6f}e+{exponent} (approx.)"
+
+    def _bounded_int_result(self, value, max_digits=4000):
+        # Exact ints past max_digits can't go through str() (4300-digit cap), so report them as an estimate instead.
+        if abs(value).bit_length() * math.log10(2) <= max_digits: return value
+        return ("-" if value < 0 else "") + self._format_huge_int_estimate(math.log10(abs(value)))
+
+    def _handle_number_theory(self, expr_str):
+        self.logger.debug(f"Number theory handler received: '{expr_str}'")
+        m = re.fullmatch(r"\s*([a-z]+)\s*\((.*)\)\s*", expr_str.lower())
+        func, args_str = m.groups()
+        arity = {'isprime': 1, 'factor': 1, 'factorize': 1, 'nextprime': 1, 'totient': 1, 'phi': 1, 'factorial': 1,
+                 'powmod': 3, 'ncr': 2, 'npr': 2}[func]
+        args = []
+        for arg_str in self._split_call_args(args_str):
+            try: args.append(eval_int_expr(arg_str))
+            except TypeError: return f"Error: {func} requires integer arguments"
+            except OverflowError: return "Error: Result too large"
+            except (SyntaxError, ValueError, ZeroDivisionError): return f"Error: Invalid integer expression '{arg_str}'"
+        if len(args) != arity: return f"Error: {func} takes {arity} argument{'s' if arity > 1 else ''}"
+        budget = self.settings.get("number_theory_time_budget_s", 2.0)
+        max_digits = 4000
+        if func in ('isprime', 'nextprime') and args[0].bit_length() > _MAX_PRIMALITY_BITS:
+            return f"Error: {func} supports arguments up to about 1000 digits"
+        deadline = time.monotonic() + budget
+        try:
+            if func == 'isprime': return str(is_prime(args[0], deadline))
+            if func == 'nextprime': return next_prime(args[0], deadline)
+            if func in ('factor', 'factorize'):
+                n = args[0]
+                if abs(n) < 2: return str(n)
+                factors, leftovers = factorize(abs(n), budget)
+                parts = (["-1"] if n < 0 else []) + [f"{p}^{e}" if e > 1 else str(p) for p, e in factors.items()]
+                result = " * ".join(parts + [str(self._bounded_int_result(c, max_digits)) for c in leftovers])
+                return f"{result} (partial: {len(leftovers)} factor{'s' if len(leftovers) > 1 else ''} left unresolved)" if leftovers else result
+            if func in ('totient', 'phi'):
+                if args[0] < 1: return "Error: totient requires a positive integer"
+                phi = totient(args[0], budget)
+                return self._bounded_int_result(phi, max_digits) if phi is not None else "Error: Could not factor in time for totient"
+            if func == 'powmod':
+                base, exp, mod = args
+                if mod == 0: return "Error: Modulus must be non-zero"
+                try: return self._bounded_int_result(pow(base, exp, mod), max_digits)
+                except ValueError: return "Error: Base is not invertible for this modulus"
+            if func == 'factorial':
+                n = args[0]
+                if n < 0: return "Error: factorial requires a non-negative integer"
+                log10_fact = math.lgamma(n + 1) / math.log(10)
+                return self._format_huge_int_estimate(log10_fact) if log10_fact > max_digits else math.factorial(n)
+            n, r = args
+            if n < 0 or r < 0: return f"Error: {func} requires non-negative integers"
+            if r > n: return 0
+            log10_value = (math.lgamma(n + 1) - math.lgamma(n - r + 1) - (math.lgamma(r + 1) if func == 'ncr' else 0)) / math.log(10)
+            if log10_value > max_digits: return self._format_huge_int_estimate(log10_value)
+            return math.comb(n, r) if func == 'ncr' else math.perm(n, r)
+        except TimeoutError: return f"Error: {func} did not finish within {budget:g}s"
+        except Exception as e: self.logger.error(f"Number theory error '{expr_str}': {e}", exc_info=True); return f"Error: {func} failed ({type(e).__name__})"
+
+    def _checked_factorial(self, n):
+        # Guards factorial() inside general expressions so huge arguments fail fast instead of stalling the monitor thread.
+        if isinstance(n, int) and n > 1000: raise OverflowError("factorial argument too large")
+        return math.factorial(n)
 
     def _handle_date_calculation(self, expr_str_orig):
         self.logger.debug(f"Date handler received: '{expr_str_orig}'")
@@ -508,6 +1564,36 @@ class ClipboardCalculator:
         except ValueError: return "Error: Invalid number for base conversion"
         except Exception as e: self.logger.error(f"Base conv error '{expr_str}': {e}", exc_info=True); return f"Error: Base conversion failed ({type(e).__name__})"
 
+    def _handle_currency_conversion(self, expr_str):
+        self.logger.debug(f"Currency handler received: '{expr_str}'")
+        m = re.fullmatch(r"(\d+\.?\d*|\.\d+)\s*([a-z]{3})\s+(?:to|in)\s+([a-z]{3})", expr_str.strip().replace(',', ''), re.IGNORECASE)
+        if not m: return "Error: Currency format not recognized (e.g. 100 USD to EUR)"
+        amount_s, from_code, to_code = m.groups()
+        try:
+            converted = self.currency_rates.convert(float(amount_s), from_code, to_code)
+            return f"{converted:,.2f} {to_code.upper()}" if abs(converted) >= 0.01 or converted == 0 else f"{converted:.6g} {to_code.upper()}"
+        except FileNotFoundError: return f"Error: Currency rates file not found ({self.currency_rates.path})"
+        except KeyError as e: return f"Error: Unknown currency '{e.args[0]}'"
+        except (ValueError, TypeError) as e: self.logger.error(f"Invalid currency rates file: {e}"); return "Error: Invalid currency rates file"
+        except Exception as e: self.logger.error(f"Currency conv error '{expr_str}': {e}", exc_info=True); return f"Error: Currency conversion failed ({type(e).__name__})"
+
+    def sync_currency_rates(self):
+        # Runs off the clipboard path: pulls the rate file from a local endpoint, the table hot-reloads it on change.
+        url, path = self.settings.get("currency_rates_url"), self.currency_rates.path
+        self.logger.info(f"Currency rate sync started ({url}).")
+        while not self.stop_event.is_set():
+            try:
+                with urllib.request.urlopen(url, timeout=10) as resp: payload = resp.read()
+                data = json.loads(payload)
+                if "base" not in data or "rates" not in data: raise ValueError("missing 'base' or 'rates'")
+                tmp_path = path + ".tmp"
+                with open(tmp_path, 'wb') as f: f.write(payload)
+                os.replace(tmp_path, path)
+                self.logger.debug(f"Currency rates synced to {path}")
+            except Exception as e: self.logger.error(f"Currency rate sync failed: {e}")
+            self.stop_event.wait(self.settings.get("currency_sync_interval_s", 3600))
+        self.logger.info("Currency rate sync stopped.")
+
     def _handle_statistical_calculation(self, expr_str):
         self.logger.debug(f"Stats handler received: '{expr_str}'")
         if not statistics:
@@ -569,7 +1655,7 @@ class ClipboardCalculator:
         expr_proc_eval = re.sub(r'(?<=[0-9\)\s])\s*x\s*(?=[\s0-9\(a-z_])', '*', expr_proc_eval)
 
 
-        allowed_names = {"pi": math.pi, "e": math.e, "abs": math.fabs, "factorial": math.factorial, "gamma": math.gamma, 
+        allowed_names = {"pi": math.pi, "e": math.e, "abs": math.fabs, "factorial": self._checked_factorial, "gamma": math.gamma, 
                          "lgamma": math.lgamma, "sqrt": math.sqrt, "cbrt": math.cbrt, "exp": math.exp, "expm1": math.expm1,
                          "log": math.log, "log10": math.log10, "log2": math.log2, "log1p": math.log1p,
                          "sin": math.sin, "cos": math.cos, "tan": math.tan, "asin": math.asin, "acos": math.acos, 
@@ -639,10 +1725,39 @@ class ClipboardCalculator:
         self.overlay.geometry(f"{total_w}x{total_h}+{cur_x}+{cur_y}")
 
     def add_to_history(self, expression, result):
-        entry = {"timestamp": time.strftime("%Y-%m-%d %H:%M:%S"), "expression": expression, "result": str(result)}
-        if hasattr(self, '_last_sympy_solution_obj') and self._last_sympy_solution_obj is not None:
-            entry["sympy_obj"] = self._last_sympy_solution_obj; self._last_sympy_solution_obj = None 
-        self.calculation_history.append(entry)
+        record = HistoryRecord(expression, str(result), sympy_srepr=getattr(self, '_last_sympy_solution_srepr', None),
+                               max_text_chars=self.settings.get("history_max_text_chars", 500),
+                               max_srepr_chars=self.settings.get("history_max_srepr_chars", 2000), share=self.history_text_pool.share)
+        self._last_sympy_solution_srepr = None
+        self.calculation_history.append(record)
+        # Count limit is enforced by the deque; the byte budget drops oldest records beyond it (always keeping the newest),
+        # using the same shared-strings-once accounting that the memory report shows.
+        total, refs, sizes = self._history_size_index()
+        budget = self.settings.get("max_history_bytes", 1048576)
+        while total > budget and len(self.calculation_history) > 1:
+            old = self.calculation_history.popleft(); total -= sys.getsizeof(old)
+            for value in old.text_values():
+                refs[id(value)] -= 1
+                if not refs[id(value)]: total -= sizes[id(value)]
+        self.history_text_pool.retain(self.calculation_history) # Also drops strings of records the deque's maxlen pushed out
+
+    def _history_size_index(self):
+        # Returns (total bytes, references per string id, size per string id); each shared string is counted once.
+        total, refs, sizes = 0, {}, {}
+        for record in self.calculation_history:
+            total += sys.getsizeof(record)
+            for value in record.text_values():
+                key = id(value)
+                if key not in refs: refs[key] = 0; sizes[key] = sys.getsizeof(value); total += sizes[key]
+                refs[key] += 1
+        return total, refs, sizes
+
+    def history_memory_usage(self):
+        return self._history_size_index()[0]
+
+    def history_memory_report(self):
+        return (f"History: {len(self.calculation_history)} items, {self.history_memory_usage() / 1024:.1f} KB "
+                f"(budget {self.settings.get('max_history_bytes', 1048576) / 1024:.0f} KB)")
 
     def show_history_window(self):
         if hasattr(self, 'history_window') and self.history_window.winfo_exists(): self.history_window.lift(); return
@@ -656,15 +1771,18 @@ class ClipboardCalculator:
         y_scroll.config(command=self.history_listbox.yview); x_scroll.config(command=self.history_listbox.xview)
         y_scroll.pack(side=tk.RIGHT, fill=tk.Y); x_scroll.pack(side=tk.BOTTOM, fill=tk.X); self.history_listbox.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
         for item in reversed(self.calculation_history): 
-            res_s = str(item['result'])
-            is_complex = res_s.startswith("x =") or "->" in res_s or "days" in res_s.lower() or \
+            res_s = item.result
+            is_complex = re.match(r"[a-z_]\w* = ", res_s) or "->" in res_s or "days" in res_s.lower() or \
                          re.match(r"\d{4}-\d{2}-\d{2}", res_s) or re.match(r"(0x[0-9a-fA-F]+|0b[01]+|0o[0-7]+)", res_s, re.IGNORECASE)
-            self.history_listbox.insert(tk.END, f"[{item['timestamp']}] {item['expression']} {' => ' if is_complex else ' = '}{res_s}")
+            flat = lambda text: text.replace("\n", "; ").replace("\t", " ") # Listbox rows are single-line; matrices are tab/newline grids
+            self.history_listbox.insert(tk.END, f"[{item.timestamp_str}] {flat(item.expression)} {' => ' if is_complex else ' = '}{flat(res_s)}")
         btn_f = tk.Frame(self.history_window, bg=self.settings.get("overlay_bg_color", "white")); btn_f.pack(fill=tk.X, padx=5, pady=5)
         tk.Button(btn_f, text="Copy Expression", command=lambda: self.copy_history_item_part("expression")).pack(side=tk.LEFT, padx=2)
         tk.Button(btn_f, text="Copy Result/Solution", command=lambda: self.copy_history_item_part("result")).pack(side=tk.LEFT, padx=2)
         tk.Button(btn_f, text="Copy as LaTeX", command=lambda: self.copy_history_item_part("latex")).pack(side=tk.LEFT, padx=2)
         tk.Button(btn_f, text="Clear History", command=self.clear_history).pack(side=tk.RIGHT, padx=2)
+        tk.Label(self.history_window, text=f"{self.history_memory_report()} | Result cache: {self.result_cache.stats()}", anchor="w",
+                 bg=self.settings.get("overlay_bg_color", "white"), fg=self.settings.get("overlay_text_color", "black")).pack(fill=tk.X, padx=5)
 
     def copy_history_item_part(self, part_type):
         if not hasattr(self, 'history_listbox') or not self.history_listbox.winfo_exists(): return
@@ -673,7 +1791,9 @@ class ClipboardCalculator:
         hist_idx = len(self.calculation_history) - 1 - sel[0]
         if not (0 <= hist_idx < len(self.calculation_history)): messagebox.showerror("Copy History", "Error mapping selection.", parent=self.history_window); return
         item = self.calculation_history[hist_idx]
-        expr, res = item['expression'], str(item['result'])
+        expr, res = item.expression, item.result
+        if (part_type == "expression" and item.expression_truncated) or (part_type == "result" and item.result_truncated):
+            messagebox.showinfo("Copy History", "This entry was too large to keep in full; copying its truncated preview.", parent=self.history_window)
         to_copy = ""
         if part_type == "expression": to_copy = expr
         elif part_type == "result": to_copy = res
@@ -683,18 +1803,21 @@ class ClipboardCalculator:
             lx_expr = lx_expr.replace('*', r' \times ')
             lx_expr = re.sub(r'([a-zA-Z0-9\.]+)\s*/\s*([a-zA-Z0-9\.]+)', r'\\frac{\1}{\2}', lx_expr)
             lx_res = res
-            if 'sympy_obj' in item and item['sympy_obj']:
-                try: import sympy; lx_res = (f"x = {sympy.latex(item['sympy_obj'])}" if res.startswith("x =") else sympy.latex(item['sympy_obj']))
+            if item.sympy_srepr:
+                try:
+                    import sympy; obj = item.sympy_obj
+                    if isinstance(obj, list): lx_res = r";\ ".join(r",\ ".join(f"{sympy.latex(k)} = {sympy.latex(v)}" for k, v in sol.items()) for sol in obj)
+                    else: lx_res = sympy.latex(obj)
                 except Exception as e: self.logger.error(f"Sympy LaTeX err: {e}")
             # Removed Pint specific LaTeX part
-            sep = r" \Rightarrow " if res.startswith("x =") else " = "
+            sep = r" \Rightarrow " if re.match(r"[a-z_]\w* = ", res) else " = "
             to_copy = f"${lx_expr}{sep}{lx_res}$"
         if to_copy and pyperclip: pyperclip.copy(to_copy); self.logger.info(f"Copied from history ({part_type}): {to_copy[:70]}...")
         elif not pyperclip: messagebox.showerror("Error", "Pyperclip library not found.", parent=self.history_window if hasattr(self, 'history_window') else self.root)
 
     def clear_history(self):
         if messagebox.askyesno("Confirm Clear", "Clear all history?", parent=self.history_window):
-            self.calculation_history.clear()
+            self.calculation_history.clear(); self.history_text_pool.clear()
             if hasattr(self, 'history_listbox') and self.history_listbox.winfo_exists(): self.history_listbox.delete(0, tk.END)
             self.logger.info("Calculation history cleared.")
 
@@ -731,7 +1854,10 @@ class ClipboardCalculator:
         tk.Label(self.settings_window,text="Max History Items:",bg="white").grid(row=8,column=0,padx=5,pady=5,sticky="w")
         self.max_history_var = tk.IntVar(value=self.settings.get("max_history_items",20))
         tk.Spinbox(self.settings_window,from_=5,to=100,increment=5,textvariable=self.max_history_var,width=5).grid(row=8,column=1,padx=5,pady=5,sticky="ew")
-        tk.Button(self.settings_window,text="Apply & Save",command=self.apply_and_save_settings).grid(row=9,column=0,columnspan=3,padx=5,pady=10)
+        tk.Label(self.settings_window,text="Max History Size (KB):",bg="white").grid(row=9,column=0,padx=5,pady=5,sticky="w")
+        self.max_history_kb_var = tk.IntVar(value=self.settings.get("max_history_bytes",1048576) // 1024)
+        tk.Spinbox(self.settings_window,from_=64,to=65536,increment=64,textvariable=self.max_history_kb_var,width=7).grid(row=9,column=1,padx=5,pady=5,sticky="ew")
+        tk.Button(self.settings_window,text="Apply & Save",command=self.apply_and_save_settings).grid(row=10,column=0,columnspan=3,padx=5,pady=10)
         self.settings_window.grid_columnconfigure(1,weight=1)
 
     def choose_bg_color(self):
@@ -749,7 +1875,7 @@ class ClipboardCalculator:
         if hasattr(self,'chosen_text_color_temp'): self.settings["overlay_text_color"]=self.chosen_text_color_temp; del self.chosen_text_color_temp
         self.settings["overlay_opacity"]=self.opacity_var.get(); self.settings["always_on_top"]=self.always_on_top_var.get()
         self.settings["auto_copy_result"]=self.auto_copy_result_var.get(); self.settings["monitoring_interval_ms"]=self.interval_var.get()
-        self.settings["max_history_items"]=self.max_history_var.get()
+        self.settings["max_history_items"]=self.max_history_var.get(); self.settings["max_history_bytes"]=self.max_history_kb_var.get() * 1024
         self.update_overlay_appearance(); self.save_settings()
         if hasattr(self,'settings_window') and self.settings_window.winfo_exists(): self.settings_window.destroy()
         self.logger.info("Settings applied and saved.")
@@ -763,6 +1889,9 @@ class ClipboardCalculator:
 
     def on_close(self):
         self.logger.info("Shutting down..."); self.stop_event.set(); self.save_settings()
+        self.logger.info(f"Result cache: {self.result_cache.stats()}"); self.result_cache.close()
+        self.symbolic_solver.close()
+        self.logger.info(self.history_memory_report())
         if self.monitor_thread and self.monitor_thread.is_alive(): self.monitor_thread.join(timeout=1.0)
         for attr in ['history_window','settings_window','overlay']:
             if hasattr(self,attr): 
@@ -776,6 +1905,7 @@ class ClipboardCalculator:
         self.logger.info("Application closed.")
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support() # Needed for the solver worker process in frozen (PyInstaller) builds
     if not pyperclip: print("Exiting: Pyperclip library is required.")
     else:
         print("Clipboard Calculator X starting...")